@@ -0,0 +1,44 @@
+"""
+bench_braille.py
+---------------------------------
+Micro-benchmark behind _VECTORIZE_MIN_LEN in unified_braille_processor.py:
+ - one uncontracted token: str.translate vs the _LUT gather kernel, by token length
+ - whole messages through translate_to_simplified_braille() (cache bypassed)
+Run: python bench_braille.py > bench_output.txt
+"""
+
+import random, string, timeit
+import numpy as np
+
+import unified_braille_processor as ubp
+
+def best_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=7)) / number * 1e6
+
+def bench_tokens():
+    gather = ubp._get_gather_cells()
+    print(f"--- single token: str.translate vs gather ({gather.__name__}) ---")
+    for n in (16, 32, 64, 96, 128, 256, 1024, 4096):
+        token = "".join(random.choices(string.ascii_lowercase + string.digits, k=n))
+        def via_gather():
+            buf = np.frombuffer(token.encode("ascii"), dtype=np.uint8)
+            return gather(buf, ubp._LUT).astype("<u4", copy=False).tobytes().decode("utf-32-le")
+        assert via_gather() == token.translate(ubp._CHAR_TABLE)
+        t_translate = best_us(lambda: token.translate(ubp._CHAR_TABLE), 3000)
+        t_gather = best_us(via_gather, 3000)
+        print(f"{n:5d} chars  translate {t_translate:7.2f}us  gather {t_gather:7.2f}us  ({t_translate / t_gather:.2f}x)")
+
+def bench_messages():
+    print("--- whole message: translate_to_simplified_braille ---")
+    words = list(ubp._WORD_MAP) + ["".join(random.choices(string.ascii_lowercase, k=random.randint(2, 9))) for _ in range(200)]
+    translate = ubp.translate_to_simplified_braille.__wrapped__
+    for n in (50, 280, 1000, 5000, 35000):
+        text = ""
+        while len(text) < n:
+            text += random.choice(words).capitalize() + " " if random.random() < 0.1 else random.choice(words) + " "
+        print(f"{len(text):6d} chars  {best_us(lambda: translate(text), max(20, 200000 // n)):9.1f}us")
+
+if __name__ == "__main__":
+    random.seed(0)
+    bench_tokens()
+    bench_messages()
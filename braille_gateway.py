@@ -6,13 +6,23 @@ Local gateway that:
  - Runs your unified_braille_processor.py to convert to Grade-2 Braille
  - Optionally receives WhatsApp messages via Twilio webhook (/whatsapp)
  - Displays and logs Braille output locally
+ - Serves the webhook from uvicorn worker processes; the folder watcher runs in its own process
 """
 
-import os, time, threading, requests
+import os, sys, time, signal, threading, multiprocessing, asyncio, aiohttp
 from pathlib import Path
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+import uvicorn
+if sys.platform.startswith("linux"):
+    from inotify_simple import INotify, flags
+else:  # inotify is Linux-only; elsewhere fall back to watchdog's portable observer
+    INotify = None
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
 
 # Import your processing module
 import unified_braille_processor as ubp
@@ -22,12 +32,21 @@ INBOX = Path("incoming_messages");  INBOX.mkdir(exist_ok=True)
 OUTBOX = Path("processed_outputs"); OUTBOX.mkdir(exist_ok=True)
 LOG = OUTBOX / "braille_log.txt"
 
+# Per-process state is created lazily: uvicorn's spawned workers run this module
+# twice (as __mp_main__ and as braille_gateway) and must not each open a log,
+# a thread pool or a download loop at import.
+_LOG_FH = None  # line-buffered; opened by the first log_output() in this process
+_LOG_LOCK = threading.Lock()  # the watcher's transcription threads log concurrently
+
 # -------------------- Utility Functions --------------------
 
 def log_output(text, braille, src="local"):
+    global _LOG_FH
     entry = f"\n---\nSource: {src}\nText: {text}\nBraille: {braille}\n"
-    with open(LOG, "a", encoding="utf8") as f:
-        f.write(entry)
+    with _LOG_LOCK:
+        if _LOG_FH is None:
+            _LOG_FH = open(LOG, "a", encoding="utf8", buffering=1)
+        _LOG_FH.write(entry)
     print(entry)
 
 def display_braille(braille):
@@ -39,93 +58,215 @@ def display_braille(braille):
 # -------------------- Local Processing --------------------
 
 def process_text_file(path: Path):
-    """Uses your process_text_file() or translate_to_simplified_braille()."""
+    """Uses translate_to_simplified_braille()."""
     try:
-        if hasattr(ubp, "process_text_file"):
-            braille = ubp.process_text_file(str(path))
-            if isinstance(braille, tuple):
-                text, braille = braille
-            else:
-                text = path.read_text(encoding="utf8")
-        else:
-            text = path.read_text(encoding="utf8")
-            braille = ubp.translate_to_simplified_braille(text)
+        text = path.read_text(encoding="utf8").strip()
+        braille = ubp.translate_to_simplified_braille(text)
         display_braille(braille)
         log_output(text, braille, "text file")
     except Exception as e:
         print("❌ Error processing text file:", e)
 
+def emit_audio_result(result, src="audio file"):
+    """Translates one (text, source, latency, ground_truth) result and displays/logs it."""
+    text, source, latency, ground_truth = result
+    if source == "Error":
+        print("❌", text); return
+    braille = ubp.translate_to_simplified_braille(text)
+    display_braille(braille)
+    log_output(text, braille, src)
+
 def process_audio_file(path: Path):
     """Uses your process_audio_file() for transcription + braille conversion."""
     try:
         if hasattr(ubp, "process_audio_file"):
-            text, braille = ubp.process_audio_file(str(path))
-            display_braille(braille)
-            log_output(text, braille, "audio file")
+            emit_audio_result(ubp.process_audio_file(str(path)))
         else:
             print("process_audio_file() not found in unified_braille_processor.")
     except Exception as e:
         print("❌ Error processing audio file:", e)
 
 # -------------------- Folder Watcher --------------------
+# The watcher is the only consumer of INBOX: the webhook just drops files here.
+# It is also the only process that loads the Whisper model.
 
-class Watcher(FileSystemEventHandler):
-    def on_created(self, event):
-        if event.is_directory: return
-        p = Path(event.src_path)
-        time.sleep(0.2)
-        if p.suffix.lower() in [".txt"]:
-            process_text_file(p);  p.unlink(missing_ok=True)
-        elif p.suffix.lower() in [".wav", ".mp3", ".ogg", ".m4a"]:
-            process_audio_file(p); p.unlink(missing_ok=True)
-        else:
-            print("Ignored file:", p.name)
+_EXECUTOR = None  # audio transcriptions in flight, one per ubp.WHISPER_WORKERS; set up by start_watcher()
+
+def process_and_remove_audio(p: Path):
+    process_audio_file(p); p.unlink(missing_ok=True)
+
+def dispatch(p: Path):
+    if p.name.startswith("."): return  # partial write, dispatched once renamed into place
+    if p.suffix.lower() in [".txt"]:
+        process_text_file(p);  p.unlink(missing_ok=True)
+    elif p.suffix.lower() in [".wav", ".mp3", ".ogg", ".m4a"]:
+        _EXECUTOR.submit(process_and_remove_audio, p)
+    else:
+        print("Ignored file:", p.name)
+
+if INotify is None:
+    class Watcher(FileSystemEventHandler):
+        def on_created(self, event):
+            if event.is_directory: return
+            time.sleep(0.2)  # no close-write event here; let the writer finish
+            dispatch(Path(event.src_path))
+
+        def on_moved(self, event):
+            if event.is_directory: return
+            dispatch(Path(event.dest_path))
 
 def start_watcher():
-    obs = Observer()
-    obs.schedule(Watcher(), str(INBOX), recursive=False)
-    obs.start()
+    """Watcher process entry point: owns the transcription pool and closes the log on exit."""
+    global _EXECUTOR
+    # multiprocessing ends children with os._exit, so atexit never runs here; turn the
+    # parent's SIGTERM into SystemExit so the finally below still cleans up.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    _EXECUTOR = ThreadPoolExecutor(max_workers=ubp.WHISPER_WORKERS)
+    ubp.warm_up_translator()  # numba import/compile happens here, not in the first long message
+    try:
+        _watch_inbox()
+    finally:
+        _EXECUTOR.shutdown(wait=True)
+        if _LOG_FH is not None:
+            _LOG_FH.close()
+
+def _watch_inbox():
     print("📂 Watching folder:", INBOX)
+    if INotify is None:
+        obs = Observer()
+        obs.schedule(Watcher(), str(INBOX), recursive=False)
+        obs.start()
+        try:
+            while True: time.sleep(1)
+        except KeyboardInterrupt: obs.stop()
+        obs.join()
+        return
+    # CLOSE_WRITE + MOVED_TO only: the kernel filters out open/modify/access noise.
+    # CLOSE_WRITE fires once the writer is done (no settle delay needed); MOVED_TO
+    # catches files renamed or moved into the inbox (atomic writes, drag-and-drop).
+    ino = INotify()
+    ino.add_watch(str(INBOX), flags.CLOSE_WRITE | flags.MOVED_TO)
     try:
-        while True: time.sleep(1)
-    except KeyboardInterrupt: obs.stop()
-    obs.join()
+        while True:
+            for ev in ino.read():
+                if ev.mask & flags.ISDIR or not ev.name: continue
+                dispatch(INBOX / ev.name)
+    except KeyboardInterrupt: pass
+    finally: ino.close()
 
 # -------------------- Flask Webhook for Twilio --------------------
 
 app = Flask(__name__)
+_loop = None     # per-process asyncio loop that runs all media downloads concurrently
+_loop_lock = threading.Lock()
+_http = None     # aiohttp.ClientSession (keep-alive pool to Twilio's media CDN), owned by _loop
 
-def download_media(url, dest):
+def _download_loop():
+    """Starts this process's download loop on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True).start()
+    return _loop
+
+async def download_media(url, dest):
+    global _http
+    loop = asyncio.get_running_loop()
     try:
-        r = requests.get(url, stream=True, timeout=15); r.raise_for_status()
-        with open(dest, "wb") as f:
-            for chunk in r.iter_content(8192): f.write(chunk)
+        if _http is None:
+            _http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=15, sock_read=15))
+        async with _http.get(url) as r:
+            r.raise_for_status()
+            # Disk I/O goes to the loop's thread pool so other downloads keep streaming.
+            f = await loop.run_in_executor(None, open, dest, "wb")
+            try:
+                async for chunk in r.content.iter_chunked(65536):
+                    await loop.run_in_executor(None, f.write, chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
         return True
     except Exception as e:
         print("❌ Download error:", e); return False
 
+def inbox_paths(suffix):
+    """Returns (partial, final) paths for a new message; the watcher skips dotfiles until the rename."""
+    name = f"msg_{uuid4().hex}{suffix}"
+    return INBOX / f".{name}.part", INBOX / name
+
+async def fetch_audio(url, part, dest):
+    """Downloads a voice note and renames it into the inbox once it is fully on disk."""
+    loop = asyncio.get_running_loop()
+    delivered = False
+    try:
+        if await download_media(url, part):
+            await loop.run_in_executor(None, os.replace, part, dest); delivered = True
+    finally:
+        # Also runs when shutdown cancels the task; the watcher never looks at .part files.
+        if not delivered: part.unlink(missing_ok=True)
+
+def _report_download(future):
+    if not future.cancelled() and future.exception() is not None:
+        print("❌ Download task failed:", future.exception())
+
 @app.route("/whatsapp", methods=["POST"])
 def whatsapp():
     body = request.form.get("Body", "").strip()
     media_url = request.form.get("MediaUrl0")
     media_type = request.form.get("MediaContentType0", "")
+    # Reply to Twilio right away and let the watcher process pick the file up;
+    # STT can take longer than Twilio's 15s webhook timeout.
     if media_url and "audio" in media_type:
-        fname = INBOX / f"msg_{int(time.time())}.ogg"
-        if download_media(media_url, fname): process_audio_file(fname)
+        part, fname = inbox_paths(".ogg")
+        future = asyncio.run_coroutine_threadsafe(fetch_audio(media_url, part, fname), _download_loop())
+        future.add_done_callback(_report_download)
         return jsonify({"ok": True})
     elif body:
-        fname = INBOX / f"msg_{int(time.time())}.txt"
-        fname.write_text(body, encoding="utf8")
-        process_text_file(fname)
+        part, fname = inbox_paths(".txt")
+        part.write_text(body, encoding="utf8"); os.replace(part, fname)
         return jsonify({"ok": True})
     return jsonify({"ok": False})
 
+async def _drain_downloads():
+    """Runs on _loop: cancels unfinished downloads, waits for their cleanup, closes the session."""
+    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for t in tasks: t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if _http is not None: await _http.close()
+
+async def _close_download_loop():
+    """Drains this worker's download loop, then stops it."""
+    if _loop is None: return
+    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_drain_downloads(), _loop))
+    _loop.call_soon_threadsafe(_loop.stop)
+
+_wsgi_app = WsgiToAsgi(app)
+
+async def asgi_app(scope, receive, send):
+    """The Flask app under ASGI, plus lifespan shutdown (atexit never runs in uvicorn workers)."""
+    if scope["type"] != "lifespan":
+        # WsgiToAsgi runs views thread-sensitively, i.e. all on one shared thread per
+        # process; a context per request gives each request its own thread instead.
+        async with ThreadSensitiveContext():
+            return await _wsgi_app(scope, receive, send)
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await _close_download_loop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
 # -------------------- Main Runner --------------------
 
+WEB_WORKERS = 4
+
 def main():
-    t = threading.Thread(target=start_watcher, daemon=True)
-    t.start()
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    watcher = multiprocessing.Process(target=start_watcher, daemon=True)
+    watcher.start()
+    # Workers only accept webhooks and write into INBOX; each lazily gets its own download loop.
+    uvicorn.run("braille_gateway:asgi_app", host="0.0.0.0", port=5000, workers=WEB_WORKERS)
 
 if __name__ == "__main__":
     main()
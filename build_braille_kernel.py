@@ -0,0 +1,27 @@
+"""
+build_braille_kernel.py
+---------------------------------
+Ahead-of-time build of the optional _braille_kernel C extension (cffi):
+ - translate_ascii(buf, len, lut, out): out[i] = lut[buf[i]] for ASCII bytes
+unified_braille_processor.py uses it for the long-token gather when it can be
+imported, and falls back to numba / NumPy otherwise.
+Run once (needs cffi and a C compiler): python build_braille_kernel.py
+"""
+
+from pathlib import Path
+from cffi import FFI
+
+ffibuilder = FFI()
+ffibuilder.cdef("void translate_ascii(const uint8_t *buf, size_t len, const uint32_t *lut, uint32_t *out);")
+# The table is passed in rather than compiled in, so editing BRAILLE_MAP never
+# leaves a stale extension behind.
+ffibuilder.set_source("_braille_kernel", """
+    #include <stddef.h>
+    #include <stdint.h>
+    void translate_ascii(const uint8_t *buf, size_t len, const uint32_t *lut, uint32_t *out) {
+        for (size_t i = 0; i < len; i++) out[i] = lut[buf[i] & 0x7f];
+    }
+""")
+
+if __name__ == "__main__":
+    ffibuilder.compile(tmpdir=str(Path(__file__).resolve().parent))